@@ -18,11 +18,28 @@
 
 # -*- coding: utf-8 -*-
 
-import os, tarfile, numpy, math, networkx, queue, random,traceback
+import os, io, gzip, hashlib, pickle, shutil, tarfile, tempfile, numpy, networkx, random,traceback
+import concurrent.futures, collections, functools, itertools, multiprocessing, queue
 from enum import IntEnum
 
 import time
 
+try:
+    # Optional: gzip decompression accelerated by the ISA-L library
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+# Size of the chunks copied while decompressing the dataset tars
+_TAR_BUFFER_SIZE = 2 * 1024 * 1024
+# Decompressed dataset tars larger than this are kept in a temporary file
+# on disk instead of in memory
+_TAR_SPOOL_SIZE = 128 * 1024 * 1024
+# Directory of each dataset directory where the parsed graphs and routing
+# matrices are cached. It is kept out of graphs/ and routings/, which are
+# listed as input files.
+_CACHE_DIR = ".datanet_cache"
+
 class DatanetException(Exception):
     """
     Exceptions generated when processing dataset
@@ -117,6 +134,26 @@ class Sample:
     links_performance: list-of-dict-of-dict data structure:
         The outer list contain a dict-of-dict for each node. The first dict contain
         the list of adjacents nodes and the last dict contain the parameters of the link.
+    performance_agg_arrays : dict of NxN arrays
+        Aggregated performance information stored as one float array per
+        parameter ('PktsDrop', 'AvgDelay', ...). Cell [i,j] of each array
+        contains the value between source i and destination j. The arrays
+        are views of the fields of performance_agg_records.
+    performance_agg_records : NxN structured array
+        Aggregated performance information stored as one record per src-dst
+        pair, with one float field per parameter. Cell [i,j]['AvgDelay']
+        contains the value between source i and destination j.
+    traffic_agg_arrays : dict of NxN arrays
+        Aggregated traffic information stored as one float array per
+        parameter ('AvgBw', 'PktsGen', 'TotalPktsGen').
+    bandwidth_matrix : NxN array
+        Matrix where each cell [i,j] contains the bandwidth of the link
+        between node i and node j, or -1 if they are not connected. Links
+        without a valid bandwidth are NaN.
+    
+    performance_matrix and traffic_matrix are built the first time that any
+    of them is accessed, and the dictionaries of each src-dst pair the first
+    time that the pair is accessed.
     
     """
     
@@ -125,11 +162,16 @@ class Sample:
     global_delay = None
     maxAvgLambda = None
     
-    performance_matrix = None
-    traffic_matrix = None
+    _performance_matrix = None
+    _traffic_matrix = None
+    _matrices_builder = None
     routing_matrix = None
     topology_object = None
     links_performance = None
+    performance_agg_arrays = None
+    performance_agg_records = None
+    traffic_agg_arrays = None
+    bandwidth_matrix = None
     
     num_bin = 0
     _sim_time = 0
@@ -144,6 +186,32 @@ class Sample:
     _routing_file = None
     _graph_file = None
     
+    @property
+    def performance_matrix(self):
+        if (self._matrices_builder is not None):
+            self._build_matrices()
+        return self._performance_matrix
+    
+    @performance_matrix.setter
+    def performance_matrix(self, m):
+        # A pending builder would overwrite m, and it also builds the other
+        # matrix, so it is run first
+        self._build_matrices()
+        self._performance_matrix = m
+    
+    @property
+    def traffic_matrix(self):
+        if (self._matrices_builder is not None):
+            self._build_matrices()
+        return self._traffic_matrix
+    
+    @traffic_matrix.setter
+    def traffic_matrix(self, m):
+        # A pending builder would overwrite m, and it also builds the other
+        # matrix, so it is run first
+        self._build_matrices()
+        self._traffic_matrix = m
+    
     def get_global_packets(self):
         """
         Return the number of packets transmitted in the network per time unit of this Sample instance.
@@ -200,6 +268,22 @@ class Sample:
         """
         return self.performance_matrix[src, dst]
         
+    def get_performance_agg_arrays(self):
+        """
+        Returns a dictionary with an NxN array for each aggregated performance
+        parameter of this Sample instance.
+        """
+        
+        return self.performance_agg_arrays
+    
+    def get_performance_agg_records(self):
+        """
+        Returns an NxN structured array with the aggregated performance
+        parameters of each src-dst pair of this Sample instance.
+        """
+        
+        return self.performance_agg_records
+    
     def get_traffic_matrix(self):
         """
         Returns the traffic_matrix of this Sample instance.
@@ -227,6 +311,14 @@ class Sample:
         
         return self.traffic_matrix[src, dst]
         
+    def get_traffic_agg_arrays(self):
+        """
+        Returns a dictionary with an NxN array for each aggregated traffic
+        parameter of this Sample instance.
+        """
+        
+        return self.traffic_agg_arrays
+        
     def get_routing_matrix(self):
         """
         Returns the routing_matrix of this Sample instance.
@@ -328,22 +420,53 @@ class Sample:
         Bandwidth in bits/time unit of the link between nodes src-dst or -1 if not connected
 
         """
-        if dst in self.topology_object[src]:
+        net_size = self.bandwidth_matrix.shape[0]
+        if (not (0 <= src < net_size and 0 <= dst < net_size)):
+            # Not a cell of the matrix, e.g. a negative index: the nodes are
+            # looked up in the graph
+            if dst in self.topology_object[src]:
+                return (float(self.topology_object[src][dst][0]['bandwidth']))
+            return (-1)
+        cap = self.bandwidth_matrix[src, dst]
+        if (numpy.isnan(cap)):
+            # Link without a valid bandwidth: read it from the graph, which
+            # raises the corresponding error
             cap = float(self.topology_object[src][dst][0]['bandwidth'])
+        elif (cap != -1):
+            cap = float(cap)
         else:
             cap = -1
             
         return cap
     
+    def get_bandwidth_matrix(self):
+        """
+        Returns a matrix with the bandwidth in bits/time unit of the link between
+        each pair of nodes, or -1 if they are not connected. Links without a
+        valid bandwidth attribute are NaN.
+        """
+        
+        return self.bandwidth_matrix
+    
     def get_links_performance(self):
         """
         Returns the links_performance object of this Sample instance.
         """
-        if (self.links_performance == None):
-            raise DatanetException("ERROR: The processed dataset doesn't have link performance data")
+        self._check_links_performance()
         
         return self.links_performance
     
+    def _check_links_performance(self):
+        """
+        Raises a DatanetException if this Sample instance has no link
+        performance data.
+        """
+        
+        # Compared with "is" so the check does not depend on the type of
+        # links_performance
+        if (self.links_performance is None):
+            raise DatanetException("ERROR: The processed dataset doesn't have link performance data")
+    
     def get_srcdst_link_performance(self, src, dst):
         """
         
@@ -361,8 +484,7 @@ class Sample:
         None if no link exist between src and dst
 
         """
-        if (self.links_performance == None):
-            raise DatanetException("ERROR: The processed dataset doesn't have link performance data")
+        self._check_links_performance()
         res = None
         
         if dst in self.links_performance[src]:
@@ -377,6 +499,50 @@ class Sample:
         """
         self.data_set_file = file
         
+    def _set_matrices_builder(self, builder):
+        """
+        Sets the function called with this Sample instance to build the
+        performance_matrix and traffic_matrix on first access.
+        """
+        
+        self._matrices_builder = builder
+        
+    def _build_matrices(self):
+        """
+        Builds the performance_matrix and traffic_matrix of this Sample
+        instance if they were not built yet.
+        """
+        
+        builder = self._matrices_builder
+        if (builder is not None):
+            self._matrices_builder = None
+            builder(self)
+        
+    def __getstate__(self):
+        """
+        Builds the performance_matrix and traffic_matrix before this Sample
+        instance is pickled or copied, so the builder, which references the
+        reader and its caches, is not pickled with it.
+        """
+        
+        self._build_matrices()
+        state = self.__dict__.copy()
+        # The arrays are views of the records, which are restored as views
+        # instead of being pickled as copies
+        if (self.performance_agg_records is not None):
+            state.pop('performance_agg_arrays', None)
+        return (state)
+    
+    def __setstate__(self, state):
+        """
+        Restores a pickled or copied Sample instance.
+        """
+        
+        self.__dict__.update(state)
+        records = self.performance_agg_records
+        if (records is not None and 'performance_agg_arrays' not in state):
+            self.performance_agg_arrays = {param:records[param] for param in records.dtype.names}
+        
     def _set_performance_matrix(self, m):
         """
         Sets the performance_matrix of this Sample instance.
@@ -398,6 +564,27 @@ class Sample:
         
         self.routing_matrix = m
         
+    def _set_performance_agg_arrays(self, d):
+        """
+        Sets the performance_agg_arrays of this Sample instance.
+        """
+        
+        self.performance_agg_arrays = d
+        
+    def _set_performance_agg_records(self, m):
+        """
+        Sets the performance_agg_records of this Sample instance.
+        """
+        
+        self.performance_agg_records = m
+        
+    def _set_traffic_agg_arrays(self, d):
+        """
+        Sets the traffic_agg_arrays of this Sample instance.
+        """
+        
+        self.traffic_agg_arrays = d
+        
     def _set_topology_object(self, G):
         """
         Sets the topology_object of this Sample instance.
@@ -405,6 +592,13 @@ class Sample:
         
         self.topology_object = G
         
+    def _set_bandwidth_matrix(self, m):
+        """
+        Sets the bandwidth_matrix of this Sample instance.
+        """
+        
+        self.bandwidth_matrix = m
+        
     def _set_global_packets(self, x):
         """
         Sets the global_packets of this Sample instance.
@@ -501,6 +695,206 @@ class Sample:
         
         return self.traffic_matrix[src, dst]
 
+class _LazyMatrixCells:
+    """
+    Cells of the performance and traffic matrices of a sample. The cells of a
+    src-dst pair are built in both matrices the first time they are accessed.
+    """
+    
+    def __init__(self, net_size, build_cell):
+        self.net_size = net_size
+        self.matrices = (numpy.empty((net_size, net_size), dtype=object),
+                         numpy.empty((net_size, net_size), dtype=object))
+        self.built = numpy.zeros((net_size, net_size), dtype=bool)
+        self._build_cell = build_cell
+    
+    def build(self, src, dst):
+        """
+        Builds the cells of the src-dst pair if they were not built yet.
+        """
+        
+        if (not self.built[src, dst]):
+            (self.matrices[0][src, dst],
+             self.matrices[1][src, dst]) = self._build_cell(src*self.net_size + dst)
+            self.built[src, dst] = True
+    
+    def build_all(self):
+        """
+        Builds all the cells that were not built yet.
+        """
+        
+        if (self._build_cell is None):
+            return
+        for (src, dst) in zip(*numpy.nonzero(~self.built)):
+            self.build(int(src), int(dst))
+        # Releases the parsed lines once every cell is built
+        self._build_cell = None
+
+class _LazyMatrix:
+    """
+    NxN matrix of dictionaries whose cells are built on demand. Indexing a
+    single cell with [src,dst] only builds that cell. Any other use of the
+    matrix builds all the cells and behaves as the numpy object array that
+    contains them. Pickling it stores that numpy array.
+    """
+    
+    def __init__(self, cells, index):
+        self._cells = cells
+        self._index = index
+    
+    def _get_array(self):
+        self._cells.build_all()
+        return self._cells.matrices[self._index]
+    
+    def _get_srcdst(self, idx):
+        """
+        Returns (src, dst) if idx selects a single cell, None otherwise.
+        """
+        
+        if (not isinstance(idx, tuple) or len(idx) != 2):
+            return None
+        if (not all(isinstance(i, (int, numpy.integer)) for i in idx)):
+            return None
+        net_size = self._cells.net_size
+        (src, dst) = idx
+        if (not (-net_size <= src < net_size and -net_size <= dst < net_size)):
+            return None
+        return (src % net_size, dst % net_size)
+    
+    def __getitem__(self, idx):
+        srcdst = self._get_srcdst(idx)
+        if (srcdst is None):
+            return self._get_array()[idx]
+        self._cells.build(*srcdst)
+        return self._cells.matrices[self._index][srcdst]
+    
+    def __setitem__(self, idx, value):
+        srcdst = self._get_srcdst(idx)
+        if (srcdst is None):
+            self._get_array()[idx] = value
+        else:
+            self._cells.build(*srcdst)
+            self._cells.matrices[self._index][srcdst] = value
+    
+    def __len__(self):
+        return self._cells.net_size
+    
+    def __iter__(self):
+        return iter(self._get_array())
+    
+    def __array__(self, dtype=None, copy=None):
+        array = self._get_array()
+        if (copy):
+            array = array.copy()
+        if (dtype is not None):
+            array = array.astype(dtype, copy=False)
+        return array
+    
+    def __reduce__(self):
+        return self._get_array().__reduce__()
+    
+    def __repr__(self):
+        return repr(self._get_array())
+    
+    def __getattr__(self, name):
+        if (name.startswith('_')):
+            raise AttributeError(name)
+        return getattr(self._get_array(), name)
+
+class _LRUCache(collections.OrderedDict):
+    """
+    Dictionary that keeps at most maxsize items. The least recently used
+    item is evicted when a new one is added to a full cache.
+    """
+    
+    def __init__(self, maxsize=128):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if (len(self) > self.maxsize):
+            self.popitem(last=False)
+
+# Reader, samples queue and stop event of the worker processes of DatanetAPI
+# when num_workers > 1
+_tar_worker_reader = None
+_tar_worker_queues = None
+_tar_worker_stop = None
+
+def _init_tar_worker(reader, samples_queues, stop_event):
+    """
+    Initializes a worker process with the DatanetAPI instance to be used and
+    the queues where the samples are sent.
+    """
+    global _tar_worker_reader, _tar_worker_queues, _tar_worker_stop
+    _tar_worker_reader = reader
+    _tar_worker_queues = samples_queues
+    _tar_worker_stop = stop_event
+    # Pending samples are discarded if the reader is stopped
+    for samples_queue in samples_queues:
+        samples_queue.cancel_join_thread()
+
+def _send_tar_file_samples(index, samples, finished, failed):
+    """
+    Sends a batch of samples of a dataset file to the main process, through
+    the queue of the file. Samples are pickled here, so errors are raised in
+    the worker instead of in the thread of the queue.
+    """
+    
+    samples_queue = _tar_worker_queues[index % len(_tar_worker_queues)]
+    samples_queue.put(pickle.dumps((index, samples, finished, failed),
+                                   protocol=pickle.HIGHEST_PROTOCOL))
+
+def _read_tar_file_samples(index, root, file):
+    """
+    Process a dataset file in a worker process. The samples are sent in
+    batches through the queue of the file as (index, samples, finished, failed)
+    tuples, where the last batch of the file has finished set to True and
+    failed is True if the processing of the file was interrupted by an error.
+    
+    """
+    samples = []
+    failed = True
+    try:
+        tar_samples = _tar_worker_reader._iter_tar_file(root, file)
+        while (True):
+            try:
+                s = next(tar_samples)
+            except StopIteration as e:
+                failed = e.value
+                break
+            # Built here so the builder, which references the reader, is not
+            # sent back to the main process
+            s._build_matrices()
+            samples.append(s)
+            if (len(samples) == DatanetAPI._SAMPLES_BATCH_SIZE):
+                _send_tar_file_samples(index, samples, False, False)
+                samples = []
+                if (_tar_worker_stop.is_set()):
+                    tar_samples.close()
+                    break
+        _send_tar_file_samples(index, samples, True, failed)
+    except Exception:
+        traceback.print_exc()
+        print ("Error in the file: %s" % (file))
+        # The samples read before the error are still sent, up to the first
+        # one that cannot be pickled
+        sendable = []
+        for s in samples:
+            try:
+                pickle.dumps(s, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                break
+            sendable.append(s)
+        _send_tar_file_samples(index, sendable, True, True)
+
 class DatanetAPI:
     """
     Class containing all the functionalities to read the dataset line by line
@@ -508,7 +902,40 @@ class DatanetAPI:
     information gathered.
     """
     
-    def __init__ (self, data_folder, intensity_values = [], shuffle=False):
+    # Time and size distributions indexed by their identifier in the traffic
+    # files: (distribution, names of the parameters that follow the identifier)
+    _TIME_DIST_PARAMS = (
+        (TimeDist.EXPONENTIAL_T, ('EqLambda', 'AvgPktsLambda', 'ExpMaxFactor')),
+        (TimeDist.DETERMINISTIC_T, ('EqLambda', 'AvgPktsLambda')),
+        (TimeDist.UNIFORM_T, ('EqLambda', 'MinPktLambda', 'MaxPktLambda')),
+        (TimeDist.NORMAL_T, ('EqLambda', 'AvgPktsLambda', 'StdDev')),
+        (TimeDist.ONOFF_T, ('EqLambda', 'PktsLambdaOn', 'AvgTOff', 'AvgTOn', 'ExpMaxFactor')),
+        (TimeDist.PPBP_T, ('EqLambda', 'BurstGenLambda', 'Bitrate', 'ParetoMinSize',
+                           'ParetoMaxSize', 'ParetoAlfa', 'ExpMaxFactor')))
+    # The Size_i and Prob_i parameters of GENERIC_S are added separately
+    _SIZE_DIST_PARAMS = (
+        (SizeDist.DETERMINISTIC_S, ('AvgPktSize',)),
+        (SizeDist.UNIFORM_S, ('AvgPktSize', 'MinSize', 'MaxSize')),
+        (SizeDist.BINOMIAL_S, ('AvgPktSize', 'PktSize1', 'PktSize2')),
+        (SizeDist.GENERIC_S, ('AvgPktSize', 'NumCandidates')))
+    # Number of values read for each distribution, including its identifier
+    _TIME_DIST_LENGTHS = numpy.array([len(names) + 1 for (_, names) in _TIME_DIST_PARAMS])
+    _SIZE_DIST_LENGTHS = numpy.array([len(names) + 1 for (_, names) in _SIZE_DIST_PARAMS])
+    # Names of the performance parameters of the results files. Each result
+    # starts with AvgBw and PktsGen, followed by these parameters.
+    _RESULT_PARAMS = ('PktsDrop', 'AvgDelay', 'AvgLnDelay', 'p10', 'p20', 'p50', 'p80', 'p90', 'Jitter')
+    # Maximum number of graphs and routing matrices kept in memory per
+    # dataset directory
+    _GRAPHS_CACHE_SIZE = 32
+    _ROUTINGS_CACHE_SIZE = 64
+    # Number of samples sent together by the worker processes, and number of
+    # batches that the queue of each file being processed can hold
+    _SAMPLES_BATCH_SIZE = 16
+    _SAMPLES_QUEUE_SIZE = 2
+    # Record of the aggregated performance parameters of a src-dst pair
+    _RESULT_DTYPE = numpy.dtype([(param, numpy.float64) for param in _RESULT_PARAMS])
+    
+    def __init__ (self, data_folder, intensity_values = [], shuffle=False, num_workers=1):
         """
         Initialization of the PasringTool instance
 
@@ -521,6 +948,9 @@ class DatanetAPI:
             to these/this value/range of values.
         shuffle: boolean
             Specify if all files should be shuffled. By default false
+        num_workers: int
+            Number of processes used to read the dataset files in parallel.
+            By default 1, which reads the files in the calling process.
         Returns
         -------
         None.
@@ -528,32 +958,40 @@ class DatanetAPI:
         """
         
         self.data_folder = data_folder
+        if (isinstance(intensity_values, (int, float))):
+            intensity_values = [intensity_values]
+        # intensity_values is normalized to a (lower, upper) tuple
         if (len(intensity_values) == 0):
             self.check_intensity = False
         elif (len(intensity_values) == 1):
             self.check_intensity = True
-            self.intensity_values = [intensity_values,intensity_values]
+            self.intensity_values = (intensity_values[0], intensity_values[0])
         elif (len(intensity_values) == 2):
             self.check_intensity = True
-            self.intensity_values = list(intensity_values)
-            self.intensity_values.sort()
+            self.intensity_values = (min(intensity_values), max(intensity_values))
         else:
-            print("ERROR: intensity_values should have 0, 1 or 2 elements")
+            raise DatanetException("ERROR: intensity_values should have 0, 1 or 2 elements")
             
         self.shuffle = shuffle
+        self.num_workers = num_workers
         
         self._all_tuple_files = []
         self._selected_tuple_files = []
         self._graphs_dic = {}
+        self._node_port_dst_dic = {}
+        self._bandwidth_matrix_dic = {}
         self._routings_dic = {}
+        self._routing_cache = _LRUCache(self._ROUTINGS_CACHE_SIZE)
         for root, dirs, files in os.walk(self.data_folder):
             if ("graphs" not in dirs or "routings" not in dirs):
                 continue
-            # Generate graphs dictionaries
-            self._graphs_dic[root] = self._generate_graphs_dic(os.path.join(root,"graphs"))
-            if (len(self._graphs_dic[root].keys()) == 0):
+            if (len(os.listdir(os.path.join(root,"graphs"))) == 0):
                 raise DatanetException ("ERROR: No graphs found in directory "+root)
-            self._routings_dic[root] = {}
+            # Graphs dictionaries are filled as the graphs are used
+            self._graphs_dic[root] = _LRUCache(self._GRAPHS_CACHE_SIZE)
+            self._node_port_dst_dic[root] = _LRUCache(self._GRAPHS_CACHE_SIZE)
+            self._bandwidth_matrix_dic[root] = _LRUCache(self._GRAPHS_CACHE_SIZE)
+            self._routings_dic[root] = _LRUCache(self._ROUTINGS_CACHE_SIZE)
             files.sort()
             # Extend the list of files to process
             self._all_tuple_files.extend([(root, f) for f in files if f.endswith("tar.gz")])
@@ -596,7 +1034,7 @@ class DatanetAPI:
 
         Parameters
         ----------
-        routing_file : str
+        routing_file : str or file object
             File where the routing information is located.
         netSize : int
             Number of nodes in the network.
@@ -609,16 +1047,10 @@ class DatanetAPI:
 
         """
         
-        fd = open(routing_file,"r")
-        R = numpy.zeros((netSize, netSize)) - 1
-        src = 0
-        for line in fd:
-            camps = line.split(',')
-            dst = 0
-            for port in camps[:-1]:
-                R[src][dst] = port
-                dst += 1
-            src += 1
+        # Each line ends with a trailing ',' so only the first netSize columns
+        # are read. The whole table is parsed by numpy in a single call.
+        R = numpy.loadtxt(routing_file, delimiter=',', usecols=range(netSize),
+                          dtype=numpy.int32, ndmin=2)
         return (R)
 
     def _getRoutingSrcPortDst(self, G):
@@ -646,14 +1078,113 @@ class DatanetAPI:
                 node_port_dst[node][port] = destination
         return(node_port_dst)
     
-    def _create_routing_matrix_from_dst_routing_file(self, G, routing_file):
+    def _get_port_dst_matrix(self, node_port_dst, netSize):
         """
+        Return a dense version of node_port_dst, so ports can be translated
+        into next nodes with numpy fancy-indexing.
 
         Parameters
         ----------
-        G : graph
-            Graph representing the network.
-        routing_file : str
+        node_port_dst : dict
+            Dictionary of dictionaries with the format
+            node_port_dst[node][port] = next_node
+        netSize : int
+            Number of nodes in the network.
+
+        Returns
+        -------
+        port_dst : netSize x (max port + 1) matrix
+            Matrix where each [i,p] states the node connected to port p of
+            node i, or -1 if the port is not used.
+
+        """
+        
+        max_port = max([port for port_dst in node_port_dst.values() for port in port_dst], default=0)
+        port_dst = numpy.full((netSize, max_port+1), -1, dtype=numpy.int32)
+        for node, ports in node_port_dst.items():
+            for port, next_node in ports.items():
+                port_dst[node, port] = next_node
+        return (port_dst)
+    
+    def _get_next_hop_matrix(self, port_dst, R):
+        """
+        Translate a port routing table into a next-hop routing table.
+
+        Parameters
+        ----------
+        port_dst : matrix
+            Matrix returned by _get_port_dst_matrix.
+        R : netSize x netSize matrix
+            Matrix where each  [i,j] states what port node i should use to
+            reach node j.
+
+        Returns
+        -------
+        next_hop : netSize x netSize matrix
+            Matrix where each [i,j] states the node that follows node i in the
+            path to node j, or -1 if node i is the destination.
+
+        Raises
+        ------
+        DatanetException
+            If the routing uses a port that the node does not have.
+
+        """
+        
+        # Ports out of range are mapped to -1, so they are reported below
+        # together with the unused ports
+        in_range = (R >= 0) & (R < port_dst.shape[1])
+        next_hop = port_dst[numpy.arange(R.shape[0])[:,None], numpy.where(in_range, R, 0)]
+        next_hop[~in_range] = -1
+        invalid = (next_hop == -1) & (R != -1)
+        if (invalid.any()):
+            (node, dst) = numpy.argwhere(invalid)[0]
+            raise DatanetException("ERROR: Node %d uses the nonexistent port %d to reach node %d"
+                                   % (node, R[node, dst], dst))
+        return (next_hop)
+    
+    def _get_paths_from_next_hop(self, next_hop, src, dst):
+        """
+        Walk the next-hop table for all the src-dst pairs at the same time.
+
+        Parameters
+        ----------
+        next_hop : netSize x netSize matrix
+            Matrix returned by _get_next_hop_matrix.
+        src : array of int
+            Source node of each path.
+        dst : array of int
+            Destination node of each path.
+
+        Returns
+        -------
+        paths : list
+            List where element k is the path (list of nodes) from src[k] to
+            dst[k].
+
+        """
+        
+        node = numpy.array(src)
+        paths = [[n] for n in node.tolist()]
+        active = numpy.flatnonzero(next_hop[node, dst] != -1)
+        while (active.size > 0):
+            node[active] = next_hop[node[active], dst[active]]
+            for k, n in zip(active.tolist(), node[active].tolist()):
+                paths[k].append(n)
+            active = active[next_hop[node[active], dst[active]] != -1]
+        return (paths)
+    
+    def _create_routing_matrix_from_dst_routing_file(self, node_port_dst, netSize, routing_file):
+        """
+
+        Parameters
+        ----------
+        node_port_dst : dict
+            Dictionary of dictionaries with the format
+            node_port_dst[node][port] = next_node
+        netSize : int
+            Number of nodes in the network.
+        routing_file : str or file object
             File where the information about routing is located. The file is a 
             destination routing file.
 
@@ -664,31 +1195,32 @@ class DatanetAPI:
             i to node j.
 
         """
-        netSize = G.number_of_nodes()
-        node_port_dst = self._getRoutingSrcPortDst(G)
         R = self._readRoutingFile(routing_file, netSize)
+        next_hop = self._get_next_hop_matrix(self._get_port_dst_matrix(node_port_dst, netSize), R)
+        src = numpy.repeat(numpy.arange(netSize), netSize)
+        dst = numpy.tile(numpy.arange(netSize), netSize)
+        paths = self._get_paths_from_next_hop(next_hop, src, dst)
+        # Paths are in row-major order, so they are stored through a flat
+        # view with plain integer indices
         MatrixPath = numpy.empty((netSize, netSize), dtype=object)
-        for src in range (0,netSize):
-            for dst in range (0,netSize):
-                node = src
-                path = [node]
-                while (R[node][dst] != -1):
-                    out_port = R[node][dst];
-                    next_node = node_port_dst[node][out_port]
-                    path.append(next_node)
-                    node = next_node
-                MatrixPath[src][dst] = path
+        flat_paths = MatrixPath.reshape(-1)
+        for k, path in enumerate(paths):
+            flat_paths[k] = path
         return (MatrixPath)
     
-    def _create_routing_matrix_from_src_routing_dir(self, G, src_routing_dir):
+    def _create_routing_matrix_from_src_routing_dir(self, node_port_dst, netSize, src_routing_files):
         """
 
         Parameters
         ----------
-        G : graph
-            Graph representing the network.
-        src_routing_dir : str
-            Directory where we found the routing filesFile. One for each src node. 
+        node_port_dst : dict
+            Dictionary of dictionaries with the format
+            node_port_dst[node][port] = next_node
+        netSize : int
+            Number of nodes in the network.
+        src_routing_files : list of str or file objects
+            Routing files found in the source routing directory. One for each
+            src node, ordered by node.
 
         Returns
         -------
@@ -698,33 +1230,30 @@ class DatanetAPI:
 
         """
         
-        netSize = G.number_of_nodes()
-        node_port_dst = self._getRoutingSrcPortDst(G)
-        src_R = []
-        for i in range(netSize):
-            routing_file = os.path.join(src_routing_dir,"Routing_src_"+str(i)+".txt")
-            src_R.append(self._readRoutingFile(routing_file, netSize))
+        # Each routing file is processed as soon as it is read, so only one
+        # netSize x netSize table is kept in memory at a time
+        port_dst = self._get_port_dst_matrix(node_port_dst, netSize)
         MatrixPath = numpy.empty((netSize, netSize), dtype=object)
-        for src in range (0,netSize):
-            R = src_R[src]
-            for dst in range (0,netSize):
-                node = src
-                path = [node]
-                while (R[node][dst] != -1):
-                    out_port = R[node][dst];
-                    next_node = node_port_dst[node][out_port]
-                    path.append(next_node)
-                    node = next_node
-                MatrixPath[src][dst] = path
+        dst = numpy.arange(netSize)
+        for src, routing_file in enumerate(src_routing_files):
+            R = self._readRoutingFile(routing_file, netSize)
+            next_hop = self._get_next_hop_matrix(port_dst, R)
+            paths = self._get_paths_from_next_hop(next_hop, numpy.full(netSize, src), dst)
+            src_paths = MatrixPath[src]
+            for k, path in enumerate(paths):
+                src_paths[k] = path
         return (MatrixPath)
 
-    def _create_routing_matrix(self, G,routing_file):
+    def _create_routing_matrix(self, node_port_dst, netSize, routing_file):
         """
 
         Parameters
         ----------
-        G : graph
-            Graph representing the network.
+        node_port_dst : dict
+            Dictionary of dictionaries with the format
+            node_port_dst[node][port] = next_node
+        netSize : int
+            Number of nodes in the network.
         routing_file : str
             File where the information about routing is located.
 
@@ -733,12 +1262,54 @@ class DatanetAPI:
         MatrixPath : NxN Matrix
             Matrix where each cell [i,j] contains the path to go from node
             i to node j.
+        
+        The routing matrix is cached in a pickle file in the cache directory
+        of the dataset, which is used while the content of the routing files
+        does not change.
 
         """
-        if (os.path.isfile(routing_file)):
-            MatrixPath = self._create_routing_matrix_from_dst_routing_file(G,routing_file)
+        dst_routing = os.path.isfile(routing_file)
+        if (dst_routing):
+            routing_files = [routing_file]
         elif(os.path.isdir(routing_file)):
-            MatrixPath = self._create_routing_matrix_from_src_routing_dir(G,routing_file)
+            routing_files = [os.path.join(routing_file,"Routing_src_"+str(i)+".txt")
+                             for i in range(netSize)]
+        
+        # Routing matrices are cached by content, so identical routing files
+        # are only processed once even if they have different names.
+        raw_files = []
+        key = hashlib.blake2b(digest_size=16)
+        key.update(repr((dst_routing, sorted((node, port, next_node)
+                                             for node, ports in node_port_dst.items()
+                                             for port, next_node in ports.items()))).encode())
+        for f in routing_files:
+            with open(f, "rb") as fd:
+                raw_files.append(fd.read())
+            key.update(len(raw_files[-1]).to_bytes(8, 'little'))
+            key.update(raw_files[-1])
+        key = key.digest()
+        if (key in self._routing_cache):
+            return (self._routing_cache[key])
+        
+        # Routing matrices are also cached in a pickle file, which is used
+        # while its content key matches
+        cache_file = self._get_cache_file(routing_file, "routing")
+        try:
+            with open(cache_file, "rb") as fd:
+                (cached_key, MatrixPath) = pickle.load(fd)
+            if (cached_key == key):
+                self._routing_cache[key] = MatrixPath
+                return (MatrixPath)
+        except Exception:
+            # Missing or unreadable cache
+            pass
+        
+        if (dst_routing):
+            MatrixPath = self._create_routing_matrix_from_dst_routing_file(node_port_dst,netSize,io.BytesIO(raw_files[0]))
+        else:
+            MatrixPath = self._create_routing_matrix_from_src_routing_dir(node_port_dst,netSize,[io.BytesIO(raw) for raw in raw_files])
+        self._routing_cache[key] = MatrixPath
+        self._write_cache(cache_file, (key, MatrixPath))
         
         return (MatrixPath)
 
@@ -761,11 +1332,130 @@ class DatanetAPI:
         
         graphs_dic = {}
         for topology_file in os.listdir(path):
-            G = networkx.read_gml(path+"/"+topology_file, destringizer=int)
-            graphs_dic[topology_file] = G
+            graphs_dic[topology_file] = self._load_graph(os.path.join(path,topology_file))
         
         return graphs_dic
     
+    def _get_cache_file(self, data_file, kind):
+        """
+        Return the pickle file where the data parsed from a graph or routing
+        file is cached.
+ 
+        Parameters
+        ----------
+        data_file : str
+            Graph or routing file (or directory) in the graphs or routings
+            directory of a dataset directory.
+        kind : str
+            Kind of the cached data: "graph" or "routing".
+ 
+        Returns
+        -------
+        cache_file : str
+            File <dataset directory>/.datanet_cache/<kind>_<name>.pkl
+         
+        """
+        
+        (data_dir, name) = os.path.split(os.path.normpath(data_file))
+        root = os.path.dirname(data_dir)
+        return (os.path.join(root, _CACHE_DIR, kind+"_"+name+".pkl"))
+    
+    def _write_cache(self, cache_file, data):
+        """
+        Pickle data into cache_file. The cache is written to a temporary file
+        unique to this writer and then renamed into place, so concurrent
+        writers (e.g., the worker processes) never truncate each other's
+        file. Errors are ignored, as the dataset directory may be read-only.
+        """
+        
+        tmp_file = None
+        try:
+            cache_dir = os.path.dirname(cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            (tmp_fd, tmp_file) = tempfile.mkstemp(dir=cache_dir, suffix=".tmp",
+                                                  prefix=os.path.basename(cache_file)+".")
+            with os.fdopen(tmp_fd, "wb") as fd:
+                pickle.dump(data, fd, protocol=pickle.HIGHEST_PROTOCOL)
+            # mkstemp creates the file readable only by its owner
+            os.chmod(tmp_file, 0o644)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if (tmp_file is not None and os.path.exists(tmp_file)):
+                os.remove(tmp_file)
+    
+    def _load_graph(self, graph_path):
+        """
+        Return the networkx object generated from a GML file.
+ 
+        Parameters
+        ----------
+        graph_path : str
+            GML file of the graph.
+ 
+        Returns
+        -------
+        G : graph
+            Graph read from the GML file.
+        
+        The parsed graph is cached in a pickle file in the cache directory of
+        the dataset, which is used while the content of the GML file does not
+        change.
+         
+        """
+        
+        # Graphs are cached by content, as routing matrices are. Modification
+        # times are kept when datasets are copied or extracted again.
+        with open(graph_path, "rb") as fd:
+            raw_graph = fd.read()
+        key = hashlib.blake2b(raw_graph, digest_size=16).digest()
+        cache_file = self._get_cache_file(graph_path, "graph")
+        try:
+            with open(cache_file, "rb") as fd:
+                (cached_key, G) = pickle.load(fd)
+            if (cached_key == key):
+                return G
+        except Exception:
+            # Missing or unreadable cache
+            pass
+        
+        G = networkx.read_gml(io.BytesIO(raw_graph), destringizer=int)
+        self._write_cache(cache_file, (key, G))
+        
+        return G
+    
+    def _get_graph(self, root, graph_file):
+        """
+        Return the graph of a dataset directory. Graphs are loaded the first
+        time they are used, together with the data derived from them.
+ 
+        Parameters
+        ----------
+        root : str
+            Directory of the dataset.
+        graph_file : str
+            Name of the GML file in the graphs directory.
+ 
+        Returns
+        -------
+        G : graph
+            Graph of the dataset directory.
+         
+        """
+        
+        if (graph_file in self._graphs_dic[root]):
+            G = self._graphs_dic[root][graph_file]
+        else:
+            G = self._load_graph(os.path.join(root,"graphs",graph_file))
+            self._graphs_dic[root][graph_file] = G
+        # The caches are bounded, so the derived data is checked separately
+        # The port to next node mapping only depends on the graph
+        if (graph_file not in self._node_port_dst_dic[root]):
+            self._node_port_dst_dic[root][graph_file] = self._getRoutingSrcPortDst(G)
+        if (graph_file not in self._bandwidth_matrix_dic[root]):
+            self._bandwidth_matrix_dic[root][graph_file] = self._create_bandwidth_matrix(G)
+        
+        return (G)
+    
     def _graph_links_update(self,G,file):
         """
         Updates the graph with the link information of the file
@@ -794,6 +1484,45 @@ class DatanetAPI:
             G[int(aux[0])][int(aux[1])][0]["bandwidth"] = int(aux[2])
             
 
+    def _create_bandwidth_matrix(self, G):
+        """
+        Return a matrix with the bandwidth of every link of the graph
+        
+        Parameters
+        ----------
+        G : graph
+            Graph representing the network.
+            
+        Returns
+        -------
+        NxN matrix where each cell [i,j] contains the bandwidth of the link
+        between node i and node j, or -1 if they are not connected. Links
+        without a valid bandwidth are NaN, so they only fail when they are
+        used.
+        
+        """
+        
+        netSize = G.number_of_nodes()
+        edges = list(G.edges(data='bandwidth'))
+        src = numpy.fromiter((e[0] for e in edges), dtype=int, count=len(edges))
+        dst = numpy.fromiter((e[1] for e in edges), dtype=int, count=len(edges))
+        bw = numpy.fromiter((self._get_bandwidth_value(e[2]) for e in edges),
+                            dtype=numpy.float64, count=len(edges))
+        bandwidth_matrix = numpy.full((netSize, netSize), -1.0)
+        bandwidth_matrix[src, dst] = bw
+        return bandwidth_matrix
+
+    def _get_bandwidth_value(self, bandwidth):
+        """
+        Return the bandwidth attribute of a link as a float, or NaN if it is
+        missing or is not a number.
+        """
+        
+        try:
+            return (float(bandwidth))
+        except (TypeError, ValueError):
+            return (numpy.nan)
+
     def _generate_routings_dic(self, path,G):
         """
         Return a dictionary with routing matrices generated from the 
@@ -813,8 +1542,10 @@ class DatanetAPI:
          
         """
         routings_dic = {}
+        node_port_dst = self._getRoutingSrcPortDst(G)
+        netSize = G.number_of_nodes()
         for routing_file in os.listdir(path):
-            R = self._create_routing_matrix(G,path+"/"+routing_file)
+            R = self._create_routing_matrix(node_port_dst,netSize,os.path.join(path,routing_file))
             routings_dic[routing_file] = R
         
         return routings_dic
@@ -839,6 +1570,81 @@ class DatanetAPI:
         
         return (first_it,last_it)
 
+    def _open_tar_file(self, data_set_file):
+        """
+        
+
+        Parameters
+        ----------
+        data_set_file : str
+            Path of the dataset tar.gz file.
+
+        Returns
+        -------
+        tar : TarFile
+            Dataset tar file opened for reading, backed by a temporary file
+            with the decompressed content. If the isal package is installed,
+            the file is decompressed with its igzip module, otherwise with
+            the gzip module of the standard library.
+
+        """
+        
+        # The file is decompressed in a single sequential pass into a seekable
+        # temporary file. Seeking backwards in a gzip stream restarts the
+        # decompression from the beginning, which would happen for every
+        # member stored before the previously extracted one.
+        gzip_module = gzip if (igzip is None) else igzip
+        tar_file = tempfile.SpooledTemporaryFile(max_size=_TAR_SPOOL_SIZE)
+        try:
+            with gzip_module.open(data_set_file, 'rb') as fileobj:
+                shutil.copyfileobj(fileobj, tar_file, _TAR_BUFFER_SIZE)
+            tar_file.seek(0)
+            return tarfile.open(fileobj=tar_file, mode='r:')
+        except:
+            tar_file.close()
+            raise
+
+    def _read_iteration_files(self, tar, dir_name, it, tar_members, has_flowresults):
+        """
+        
+
+        Parameters
+        ----------
+        tar : TarFile
+            Dataset tar file.
+        dir_name : str
+            Name of the directory inside the tar file.
+        it : int
+            Iteration whose files should be read.
+        tar_members : set
+            Names of all the members of the tar file.
+        has_flowresults : bool
+            True if the tar file contains flow simulation results.
+
+        Returns
+        -------
+        A tupla with the lines of the traffic, results, flow results and link
+        usage files of the iteration. Each file is read and decoded at once
+        and split into a list of lines. Flow results and link usage are None if they are not
+        available.
+
+        """
+        
+        it_suffix = "-"+str(it)+".txt"
+        traffic_lines = tar.extractfile(dir_name+"/traffic"+it_suffix).read().decode().splitlines()
+        results_lines = tar.extractfile(dir_name+"/simulationResults"+it_suffix).read().decode().splitlines()
+        if (has_flowresults):
+            flowresults_lines = tar.extractfile(dir_name+"/flowSimulationResults"+it_suffix).read().decode().splitlines()
+        else:
+            flowresults_lines = None
+        link_usage_name = dir_name+"/linkUsage"+it_suffix
+        if (link_usage_name in tar_members):
+            link_usage_lines = tar.extractfile(link_usage_name).read().decode().splitlines()
+        else:
+            link_usage_lines = None
+        
+        return (traffic_lines, results_lines, flowresults_lines, link_usage_lines)
+
     def __iter__(self):
         """
         
@@ -851,8 +1657,6 @@ class DatanetAPI:
 
         """
         
-        g = None
-        
         if (len(self._selected_tuple_files) > 0):
             tuple_files = self._selected_tuple_files
         else:
@@ -860,96 +1664,227 @@ class DatanetAPI:
 
         if self.shuffle:
             random.Random(1234).shuffle(tuple_files)
+        if (self.num_workers > 1):
+            tar_results = self._iter_tar_files_parallel(tuple_files)
+        else:
+            tar_results = (self._iter_tar_file(root, file) for root, file in tuple_files)
         ctr = 0
-        for root, file in tuple_files:
-            try:
-                it = 0 
-                tar = tarfile.open(os.path.join(root, file), 'r:gz')
-                (first_it,last_it) = self._get_iterations_range(file)
-                dir_info = tar.next()
+        for samples in tar_results:
+            failed = yield from samples
+            if (not failed):
+                continue
+            ctr += 1
+            print("Progress check: %d/%d" % (ctr,len(tuple_files)))
+    
+    def _iter_tar_files_parallel(self, tuple_files):
+        """
+        Process the dataset files in a pool of worker processes. A bounded
+        number of files is processed ahead of the consumer. Workers send the
+        samples in batches, so the samples of a file are available before the
+        whole file is processed. The results are returned in the same order
+        as tuple_files.
+        
+        Each file being processed has its own small queue, and only the queue
+        of the file being consumed is read. Workers that process later files
+        wait once their queue is full, so the samples held in memory are
+        bounded. The pool starts the files in order, so the file being
+        consumed is always being processed.
+
+        Parameters
+        ----------
+        tuple_files : list of tuples
+            List of tuples where each tuple is (root directory, filename)
+
+        Yields
+        ------
+        samples : generator
+            Generator with the samples of each file.
+
+        """
+        
+        ctx = multiprocessing.get_context()
+        # At most 2*num_workers+1 files are processed at the same time, and
+        # file i uses the queue i % len(samples_queues)
+        samples_queues = [ctx.Queue(maxsize=self._SAMPLES_QUEUE_SIZE)
+                          for _ in range(2*self.num_workers+1)]
+        stop_event = ctx.Event()
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers,
+                                                      mp_context=ctx,
+                                                      initializer=_init_tar_worker,
+                                                      initargs=(self, samples_queues, stop_event))
+        # Futures of the files not consumed yet
+        futures = {}
+        
+        def receive(index):
+            samples_queue = samples_queues[index % len(samples_queues)]
+            while (True):
+                try:
+                    message = samples_queue.get(timeout=1)
+                    break
+                except queue.Empty:
+                    # Errors of the pool, e.g. a worker that died
+                    for future in futures.values():
+                        if (future.done() and future.exception() is not None):
+                            raise future.exception()
+            (_, samples, finished, failed) = pickle.loads(message)
+            if (finished):
+                del futures[index]
+            return (samples, finished, failed)
+        
+        try:
+            files = iter(enumerate(tuple_files))
+            for index, (root, file) in itertools.islice(files, 2*self.num_workers):
+                futures[index] = pool.submit(_read_tar_file_samples, index, root, file)
+            for index in range(len(tuple_files)):
+                for next_index, (root, file) in itertools.islice(files, 1):
+                    futures[next_index] = pool.submit(_read_tar_file_samples, next_index, root, file)
+                yield self._iter_worker_samples(index, receive)
+        finally:
+            stop_event.set()
+            for future in futures.values():
+                future.cancel()
+            # Workers may be blocked sending samples to a full queue
+            while (any(not future.done() for future in futures.values())):
+                for samples_queue in samples_queues:
+                    try:
+                        samples_queue.get(timeout=0.1/len(samples_queues))
+                    except queue.Empty:
+                        pass
+            pool.shutdown(wait=True)
+    
+    def _iter_worker_samples(self, index, receive):
+        """
+        Yields the samples of a file received from the worker processes and
+        returns failed, mimicking the generator returned by _iter_tar_file
+        """
+        
+        while (True):
+            (samples, finished, failed) = receive(index)
+            yield from samples
+            if (finished):
+                return failed
+    
+    def _iter_tar_file(self, root, file):
+        """
+        
+
+        Parameters
+        ----------
+        root : str
+            Directory where the dataset file is located.
+        file : str
+            Name of the dataset file.
+
+        Yields
+        ------
+        s : Sample
+            Sample instance containing information about the last line read
+            from the dataset file.
+
+        Returns
+        -------
+        True if the processing of the file was interrupted by an error.
+
+        """
+        
+        g = None
+        tar = None
+        try:
+            it = 0 
+            data_set_file = os.path.join(root, file)
+            routings_dir = os.path.join(root, "routings")
+            links_bw_dir = os.path.join(root, "links_bw")
+            tar = self._open_tar_file(data_set_file)
+            (first_it,last_it) = self._get_iterations_range(file)
+            dir_info = tar.next()
+            # Loop invariants: getnames() builds a new list on every call
+            tar_members = set(tar.getnames())
+            has_flowresults = dir_info.name+"/flowSimulationResults.txt" in tar_members
+            
+            status_lines = iter(tar.extractfile(dir_info.name+"/stability.txt").read().decode().splitlines())
+            input_files_lines = iter(tar.extractfile(dir_info.name+"/input_files.txt").read().decode().splitlines())
+            
+            for it in range(first_it,last_it+1):
+                (traffic_lines, results_lines, flowresults_lines, link_usage_lines) = self._read_iteration_files(tar, dir_info.name, it, tar_members, has_flowresults)
                 
-                status_file = tar.extractfile(dir_info.name+"/stability.txt")
-                input_files = tar.extractfile(dir_info.name+"/input_files.txt")
+                input_files_line = next(input_files_lines, '')
+                status_line = next(status_lines, '')
+                if (not ";OK;" in status_line):
+                    print ("Removed iteration: "+status_line)
+                    continue;
                 
-                for it in range(first_it,last_it+1):
-                    traffic_file = tar.extractfile(dir_info.name+"/traffic-"+str(it)+".txt")
-                    results_file = tar.extractfile(dir_info.name+"/simulationResults-"+str(it)+".txt")
-                    if (dir_info.name+"/flowSimulationResults.txt" in tar.getnames()):
-                        flowresults_file = tar.extractfile(dir_info.name+"/flowSimulationResults-"+str(it)+".txt")
-                    else:
-                        flowresults_file = None
-                    if (dir_info.name+"/linkUsage-"+str(it)+".txt" in tar.getnames()):
-                        link_usage_file = tar.extractfile(dir_info.name+"/linkUsage-"+str(it)+".txt")
-                    else:
-                        link_usage_file = None
-                        
-                    input_files_line = input_files.readline().decode()[:-1]
-                    status_line = status_file.readline().decode()[:-1]
-                    if (not ";OK;" in status_line):
-                        print ("Removed iteration: "+status_line)
-                        continue;
-                    
 
+                
+                used_files = input_files_line.split(';')
+                graph_file = used_files[1]
+                routing_file = used_files[2]
+                g = self._get_graph(root, graph_file)
+                if (len(used_files) == 4):
+                    self._graph_links_update(g,os.path.join(links_bw_dir,used_files[3]))
+                    self._bandwidth_matrix_dic[root][graph_file] = self._create_bandwidth_matrix(g)
+                bandwidth_matrix = self._bandwidth_matrix_dic[root][graph_file]
+                
+                # XXX We considerer that all graphs using the same routing file have the same topology
+                if (routing_file in self._routings_dic[root]):
+                    routing_matrix = self._routings_dic[root][routing_file]
+                else:
+                    routing_matrix = self._create_routing_matrix(self._node_port_dst_dic[root][graph_file],
+                                                                 g.number_of_nodes(),
+                                                                 os.path.join(routings_dir,routing_file))
+                    self._routings_dic[root][routing_file] = routing_matrix
+                
+                # Flow results and link usage files shorter than the results
+                # are completed with empty lines
+                samples_lines = itertools.zip_longest(traffic_lines, results_lines,
+                                                      flowresults_lines or (), link_usage_lines or (),
+                                                      fillvalue='')
+                for (num_bin, (tline, rline, fline, lline)) in enumerate(samples_lines):
+                    s = Sample()
+                    s.num_bin = num_bin
+                    s._set_data_set_file_name(data_set_file)
+                    # Results lines end with a separator after the last cell
+                    s._traffic_line = tline
+                    s._status_line = status_line
+                    s._input_files_line = input_files_line
+                    s._results_line = rline.rstrip(';,')
+                    if (flowresults_lines is not None):
+                        s._flowresults_line = fline.rstrip(';,')
+                    if (link_usage_lines is not None):
+                        s._link_usage_line = lline
                     
-                    used_files = input_files_line.split(';')
-                    graph_file = used_files[1]
-                    routing_file = used_files[2]
-                    g = self._graphs_dic[root][graph_file]
-                    if (len(used_files) == 4):
-                        self._graph_links_update(g,os.path.join(root,"links_bw",used_files[3]))
+                    if (len(s._results_line) == 0 or len(s._traffic_line) == 0):
+                        break
                     
-                    # XXX We considerer that all graphs using the same routing file have the same topology
-                    if (routing_file in self._routings_dic[root]):
-                        routing_matrix = self._routings_dic[root][routing_file]
-                    else:
-                        routing_matrix = self._create_routing_matrix(g,os.path.join(root,"routings",routing_file))
-                        self._routings_dic[root][routing_file] = routing_matrix
+                    if (self.check_intensity):
+                        ptr1 = s._traffic_line.find(';')+1
+                        ptr2 = s._traffic_line.find('|',ptr1)
+                        specific_intensity = float(s._traffic_line[ptr1:ptr2])
+                        if (not self.intensity_values[0] <= specific_intensity <= self.intensity_values[1]):
+                            continue
                     
-                    num_bin = 0
-                    while (True):
-                        s = Sample()
-                        s.num_bin = num_bin
-                        num_bin += 1
-                        s._set_data_set_file_name(os.path.join(root, file))
-                        s._traffic_line = traffic_file.readline().decode()[:-1]
-                        s._status_line = status_line
-                        s._input_files_line = input_files_line
-                        s._results_line = results_file.readline().decode()[:-2]
-                        if (flowresults_file):
-                            s._flowresults_line = flowresults_file.readline().decode()[:-2]
-                        if (link_usage_file):
-                            s._link_usage_line = link_usage_file.readline().decode()[:-1]
-                        
-                        if (len(s._results_line) == 0 or len(s._traffic_line) == 0):
-                            break
-                        
-                        if (self.check_intensity):
-                            ptr1 = traffic_line.find(';')+1
-                            ptr2 = traffic_line.find('|',ptr1)
-                            specific_intensity = float(traffic_line[ptr1:ptr2])
-                            if(specific_intensity < self.intensity_values[0]) or (specific_intensity > self.intensity_values[1]):
-                                break
-                        
-                        s._graph_file = graph_file
-                        s._routing_file = routing_file
-                        
-                        s._set_routing_matrix(routing_matrix)
-                        s._set_topology_object(g)
-                        self._process_flow_results_traffic_line(s._results_line, s._traffic_line, s._flowresults_line, s._status_line, s)
-                        if (s._link_usage_line):
-                            self._process_link_usage_line(s._link_usage_line,s)
-                        it +=1
-                        yield s
-            except (GeneratorExit,SystemExit) as e:
-                raise
-            except:
-                traceback.print_exc()
-                print ("Error in the file: %s   iteration: %d" % (file,it))
+                    s._graph_file = graph_file
+                    s._routing_file = routing_file
                     
-            else:
-                continue
-            ctr += 1
-            print("Progress check: %d/%d" % (ctr,len(tuple_files)))
+                    s._set_routing_matrix(routing_matrix)
+                    s._set_topology_object(g)
+                    s._set_bandwidth_matrix(bandwidth_matrix)
+                    self._process_flow_results_traffic_line(s._results_line, s._traffic_line, s._flowresults_line, s._status_line, s)
+                    if (s._link_usage_line):
+                        self._process_link_usage_line(s._link_usage_line,s)
+                    it +=1
+                    yield s
+        except (GeneratorExit,SystemExit) as e:
+            raise
+        except:
+            traceback.print_exc()
+            print ("Error in the file: %s   iteration: %d" % (file,it))
+            return True
+        finally:
+            if (tar is not None):
+                tar.close()
+                # The temporary file is not closed by the tar
+                tar.fileobj.close()
+        return False
     
     def _process_flow_results_traffic_line(self, rline, tline, fline, sline, s):
         """
@@ -972,82 +1907,269 @@ class DatanetAPI:
 
         """
         
-        q_flows = queue.Queue()
-        first_params = rline.split('|')[0].split(',')
-        first_params = list(map(float, first_params))
+        # Lines are partitioned in a single scan into the global parameters
+        # and the per-pair part
+        (first_params, _, r_str) = rline.partition('|')
+        first_params = numpy.fromstring(first_params, sep=',').tolist()
         s._set_global_packets(first_params[0])
         s._set_global_losses(first_params[1])
         s._set_global_delay(first_params[2])
-        r = rline[rline.find('|')+1:].split(';')
+        
+        (t_head, _, t_str) = tline.partition('|')
+        s.maxAvgLambda = float(t_head.partition(';')[2])
+        sim_time  = float(sline.partition(';')[0])
+        s._sim_time = sim_time
+        net_size = s.get_network_size()
+        # All the aggregated values are parsed at once into a
+        # [parameter, src, dst] array, so each parameter is contiguous
+        agg = self._parse_line_to_floats(r_str, (net_size, net_size, -1))
+        agg = numpy.ascontiguousarray(agg.transpose(2, 0, 1))
+        # From kbps to bps, scaled once for all the src-dst pairs
+        agg[0] *= 1000
+        # The exposed arrays are copies, so changing them does not change the
+        # dictionaries built later from agg. One record per src-dst pair: the
+        # parameters are moved back to the last axis and viewed as the fields
+        # of a structured array, and the per-parameter arrays are views of
+        # those fields, so the values are only copied once.
+        num_params = len(self._RESULT_PARAMS)
+        records = numpy.ascontiguousarray(agg[2:2+num_params].transpose(1, 2, 0))
+        records = records.view(self._RESULT_DTYPE)[..., 0]
+        s._set_performance_agg_records(records)
+        s._set_performance_agg_arrays({param:records[param] for param in self._RESULT_PARAMS})
+        s._set_traffic_agg_arrays({'AvgBw':agg[0].copy(),
+                                   'PktsGen':agg[1].copy(),
+                                   'TotalPktsGen':agg[1]*sim_time})
+        # The flow results and the traffic flows are parsed and checked here,
+        # so a malformed line fails with its file. Only the dictionaries of
+        # the performance and traffic matrices are built later, if the
+        # sample's matrices are accessed.
         if (fline):
+            flows = self._parse_line_to_floats(fline, (-1, agg.shape[0]))
+            # From kbps to bps, scaled once for all the flows
+            flows[:, 0] *= 1000
+        else:
+            flows = None
+        traffic = self._parse_traffic_flows(t_str, net_size*net_size)
+        s._set_matrices_builder(functools.partial(self._process_flow_matrices, agg, traffic,
+                                                  fline, flows, sim_time))
+    
+    def _parse_traffic_flows(self, t_str, num_cells):
+        """
+        Parses the traffic flows of a line of the traffic file with a single
+        numpy call, and checks that every flow has all the parameters of its
+        distributions.
+
+        Parameters
+        ----------
+        t_str : str
+            Flows part of the line read in the traffic file.
+        num_cells : int
+            Number of src-dst pairs of the network.
+
+        Returns
+        -------
+        A tupla with the values of all the flows as a single array, the index
+        in the array of the first value of each flow (followed by the number
+        of values), and the index of the first flow of each src-dst pair
+        (followed by the number of flows).
+
+        """
+        
+        cells = t_str.split(';', num_cells)[:num_cells]
+        if (len(cells) < num_cells):
+            raise IndexError("The traffic line has fewer src-dst pairs than the network")
+        flows_str = ':'.join(cells)
+        values = numpy.fromstring(flows_str.replace(':', ','), sep=',')
+        lengths = [flow.count(',') + 1 for flow in flows_str.split(':')]
+        flow_starts = list(itertools.accumulate(lengths, initial=0))
+        if (flow_starts[-1] != len(values)):
+            raise ValueError("Malformed traffic line")
+        cell_ptrs = list(itertools.accumulate((cell.count(':') + 1 for cell in cells), initial=0))
+        self._check_traffic_flows(values, numpy.array(flow_starts[:-1]), numpy.array(lengths))
+        
+        return (values, flow_starts, cell_ptrs)
+    
+    def _check_traffic_flows(self, values, starts, lengths):
+        """
+        Checks at once that the traffic flows have all the parameters read by
+        _timedistparams and _sizedistparams. Flows with an unknown time or
+        size distribution are not read further, so they are not checked
+        further either.
+
+        Parameters
+        ----------
+        values : array
+            Values of all the flows.
+        starts : array
+            Index in values of the first value of each flow.
+        lengths : array
+            Number of values of each flow.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        time_lengths = self._TIME_DIST_LENGTHS
+        size_lengths = self._SIZE_DIST_LENGTHS
+        dist = values[starts]
+        known = (dist == numpy.trunc(dist)) & (dist >= 0) & (dist < len(time_lengths))
+        # The size distribution identifier follows the time parameters
+        offset = numpy.zeros(len(starts), dtype=numpy.int64)
+        offset[known] = time_lengths[dist[known].astype(numpy.int64)]
+        missing = known & (lengths <= offset)
+        known &= ~missing
+        dist = numpy.full(len(starts), numpy.nan)
+        dist[known] = values[starts[known] + offset[known]]
+        known &= (dist == numpy.trunc(dist)) & (dist >= 0) & (dist < len(size_lengths))
+        needed = offset.copy()
+        needed[known] += size_lengths[dist[known].astype(numpy.int64)]
+        missing |= known & (lengths < needed)
+        # GENERIC_S is also followed by NumCandidates pairs of Size_i and Prob_i
+        generic = known & ~missing & (dist == SizeDist.GENERIC_S)
+        num_candidates = values[starts[generic] + offset[generic] + 2]
+        if (not numpy.isfinite(num_candidates).all()):
+            raise ValueError("Invalid NumCandidates in the traffic line")
+        num_candidates = numpy.clip(numpy.trunc(num_candidates), 0, lengths[generic])
+        needed[generic] += 2 * num_candidates.astype(numpy.int64)
+        missing |= generic & (lengths < needed)
+        if (missing.any()):
+            raise IndexError("Missing distribution parameters in traffic flow %d" % (numpy.argmax(missing)))
+    
+    def _process_flow_matrices(self, agg, traffic, fline, flows, sim_time, s):
+        """
+        Sets the performance and traffic matrices of a sample.
+
+        Parameters
+        ----------
+        agg : array
+            Aggregated results of the sample as a [parameter, src, dst] array,
+            with AvgBw already in bps.
+        traffic : tuple
+            Traffic flows returned by _parse_traffic_flows.
+        fline : str
+            Last line read in the flows file.
+        flows : array
+            Results of every flow as a [flow, parameter] array, with AvgBw
+            already in bps, or None if there is no flows file.
+        sim_time : float
+            Simulation time of the iteration.
+        s : Sample
+            Instance of Sample associated with the current iteration.
+
+        Returns
+        -------
+        None.
+
+        """
+        
+        net_size = agg.shape[1]
+        agg_cells = agg.reshape(agg.shape[0], -1).T.tolist()
+        # Flow results have the same parameters as the aggregated results and
+        # are stored in order, cell by cell
+        if (flows is not None):
             f = fline.split(';')
+            flow_cells = flows.tolist()
         else:
-            f = r
+            f = None
+            flow_cells = agg_cells
+        # Index of the first flow of each cell in flow_cells
+        if (f):
+            flow_ptrs = list(itertools.accumulate((c.count(':') + 1 for c in f), initial=0))
+        else:
+            flow_ptrs = range(len(agg_cells) + 1)
+        # The dictionaries of each src-dst pair are only built when the pair
+        # is accessed, for both matrices at once
+        cells = _LazyMatrixCells(net_size,
+                                 functools.partial(self._process_flow_cell, agg_cells, traffic,
+                                                   flow_cells, flow_ptrs, sim_time))
+        s._set_performance_matrix(_LazyMatrix(cells, 0))
+        s._set_traffic_matrix(_LazyMatrix(cells, 1))
+    
+    def _process_flow_cell(self, agg_cells, traffic, flow_cells, flow_ptrs, sim_time, j):
+        """
+        Builds the performance and traffic dictionaries of a src-dst pair.
+
+        Parameters
+        ----------
+        agg_cells : list
+            Aggregated results of every src-dst pair.
+        traffic : tuple
+            Traffic flows returned by _parse_traffic_flows.
+        flow_cells : list
+            Results of every flow.
+        flow_ptrs : list
+            Index in flow_cells of the first flow of every src-dst pair.
+        sim_time : float
+            Simulation time of the iteration.
+        j : int
+            Index of the src-dst pair (src*N + dst).
+
+        Returns
+        -------
+        A tupla with the performance and the traffic dictionaries of the
+        src-dst pair.
+
+        """
         
-        ptr1 = tline.find(';')+1
-        ptr2 = tline.find('|',ptr1)
-        t = tline[ptr2+1:].split(';')
-        s.maxAvgLambda = float(tline[ptr1:ptr2])
-        sim_time  = float(sline.split(';')[0])
-        s._sim_time = sim_time
-        net_size = s.get_network_size()
-        m_result = []
-        m_traffic = []
-        for i in range(0,len(r), net_size):
-            new_result_row = []
-            new_traffic_row = []
-            for j in range(i, i + net_size):
-                dict_result_srcdst = {}
-                aux_agg_ = r[j].split(',')
-                aux_agg = list(map(float, aux_agg_))
-                dict_result_agg = {'PktsDrop':aux_agg[2], "AvgDelay":aux_agg[3], "AvgLnDelay":aux_agg[4], "p10":aux_agg[5], "p20":aux_agg[6], "p50":aux_agg[7], "p80":aux_agg[8], "p90":aux_agg[9], "Jitter":aux_agg[10]}
-                
-                lst_result_flows = []
-                aux_result_flows = f[j].split(':')
-                for flow in aux_result_flows:
-                    dict_result_tmp = {}
-                    tmp_result_flow = flow.split(',')
-                    tmp_result_flow = list(map(float, tmp_result_flow))
-                    q_flows.put([tmp_result_flow[0], tmp_result_flow[1]])
-                    dict_result_tmp = {'PktsDrop':tmp_result_flow[2], "AvgDelay":tmp_result_flow[3], "AvgLnDelay":tmp_result_flow[4], "p10":tmp_result_flow[5], "p20":tmp_result_flow[6], "p50":tmp_result_flow[7], "p80":tmp_result_flow[8], "p90":tmp_result_flow[9], "Jitter":tmp_result_flow[10]}
-                    lst_result_flows.append(dict_result_tmp)
-                
-                dict_traffic_srcdst = {}
-                # From kbps to bps
-                dict_traffic_agg = {'AvgBw':aux_agg[0]*1000,
-                                    'PktsGen':aux_agg[1],
-                                    'TotalPktsGen':aux_agg[1]*sim_time}
-                lst_traffic_flows = []
-                aux_traffic_flows = t[j].split(':')
-                for flow in aux_traffic_flows:
-                    dict_traffic = {}
-                    q_values_for_flow = q_flows.get()
-                    tmp_traffic_flow = flow.split(',')
-                    tmp_traffic_flow = list(map(float, tmp_traffic_flow))
-                    offset = self._timedistparams(tmp_traffic_flow,dict_traffic)
-                    if offset != -1:
-                        self._sizedistparams(tmp_traffic_flow, offset, dict_traffic)
-                        # From kbps to bps
-                        dict_traffic['AvgBw'] = q_values_for_flow[0]*1000
-                        dict_traffic['PktsGen'] = q_values_for_flow[1]
-                        dict_traffic['TotalPktsGen'] = sim_time * dict_traffic['PktsGen']
-                        dict_traffic['ToS'] = tmp_traffic_flow[-1]
-                    if (len(dict_traffic.keys())!=0):
-                        lst_traffic_flows.append (dict_traffic)
-                
-                dict_result_srcdst['AggInfo'] = dict_result_agg
-                dict_result_srcdst['Flows'] = lst_result_flows
-                dict_traffic_srcdst['AggInfo'] = dict_traffic_agg
-                dict_traffic_srcdst['Flows'] = lst_traffic_flows
-                new_result_row.append(dict_result_srcdst)
-                new_traffic_row.append(dict_traffic_srcdst)
-                
-            m_result.append(new_result_row)
-            m_traffic.append(new_traffic_row)
-        m_result = numpy.asmatrix(m_result)
-        m_traffic = numpy.asmatrix(m_traffic)
-        s._set_performance_matrix(m_result)
-        s._set_traffic_matrix(m_traffic)
+        result_params = self._RESULT_PARAMS
+        aux_agg = agg_cells[j]
+        dict_result_agg = dict(zip(result_params, aux_agg[2:]))
+        
+        # AvgBw is already in bps
+        dict_traffic_agg = {'AvgBw':aux_agg[0],
+                            'PktsGen':aux_agg[1],
+                            'TotalPktsGen':aux_agg[1]*sim_time}
+        
+        # The n-th flow of the results and of the traffic belong to the
+        # same flow, so both are processed in the same iteration
+        lst_result_flows = []
+        lst_traffic_flows = []
+        aux_result_flows = flow_cells[flow_ptrs[j]:flow_ptrs[j+1]]
+        (traffic_values, traffic_starts, traffic_ptrs) = traffic
+        aux_traffic_flows = range(traffic_ptrs[j], traffic_ptrs[j+1])
+        for tmp_result_flow, k in zip(aux_result_flows, aux_traffic_flows):
+            lst_result_flows.append(dict(zip(result_params, tmp_result_flow[2:])))
+            
+            dict_traffic = {}
+            tmp_traffic_flow = traffic_values[traffic_starts[k]:traffic_starts[k+1]].tolist()
+            offset = self._timedistparams(tmp_traffic_flow,dict_traffic)
+            if offset != -1:
+                self._sizedistparams(tmp_traffic_flow, offset, dict_traffic)
+                dict_traffic['AvgBw'] = tmp_result_flow[0]
+                dict_traffic['PktsGen'] = tmp_result_flow[1]
+                dict_traffic['TotalPktsGen'] = sim_time * tmp_result_flow[1]
+                dict_traffic['ToS'] = tmp_traffic_flow[-1]
+            if (len(dict_traffic.keys())!=0):
+                lst_traffic_flows.append (dict_traffic)
+        
+        dict_result_srcdst = {'AggInfo':dict_result_agg, 'Flows':lst_result_flows}
+        dict_traffic_srcdst = {'AggInfo':dict_traffic_agg, 'Flows':lst_traffic_flows}
+        
+        return (dict_result_srcdst, dict_traffic_srcdst)
+
+    def _parse_line_to_floats(self, line, shape):
+        """
+        
+
+        Parameters
+        ----------
+        line : str
+            Line with numeric values separated by ',', ';' or ':'.
+        shape : tuple
+            Shape of the returned array.
+
+        Returns
+        -------
+        values : numpy array
+            Array with all the values of the line. The line is parsed by
+            numpy in a single call.
+
+        """
+        
+        values = numpy.fromstring(line.replace(';',',').replace(':',','), sep=',')
+        return (values.reshape(shape))
 
     def _timedistparams(self, data, dict_traffic):
         """
@@ -1068,61 +2190,15 @@ class DatanetAPI:
 
         """
         
-    #    print(data[0])
-        if data[0] == 0: 
-            dict_traffic['TimeDist'] = TimeDist.EXPONENTIAL_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['AvgPktsLambda'] = data[2]
-            params['ExpMaxFactor'] = data[3]
-            dict_traffic['TimeDistParams'] = params
-            return 4
-        elif data[0] == 1:
-            dict_traffic['TimeDist'] = TimeDist.DETERMINISTIC_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['AvgPktsLambda'] = data[2]
-            dict_traffic['TimeDistParams'] = params
-            return 3
-        elif data[0] == 2:
-            dict_traffic['TimeDist'] = TimeDist.UNIFORM_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['MinPktLambda'] = data[2]
-            params['MaxPktLambda'] = data[3]
-            dict_traffic['TimeDistParams'] = params
-            return 4
-        elif data[0] == 3:
-            dict_traffic['TimeDist'] = TimeDist.NORMAL_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['AvgPktsLambda'] = data[2]
-            params['StdDev'] = data[3]
-            dict_traffic['TimeDistParams'] = params
-            return 4
-        elif data[0] == 4:
-            dict_traffic['TimeDist'] = TimeDist.ONOFF_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['PktsLambdaOn'] = data[2]
-            params['AvgTOff'] = data[3]
-            params['AvgTOn'] = data[4]
-            params['ExpMaxFactor'] = data[5]
-            dict_traffic['TimeDistParams'] = params
-            return 6
-        elif data[0] == 5:
-            dict_traffic['TimeDist'] = TimeDist.PPBP_T
-            params = {}
-            params['EqLambda'] = data[1]
-            params['BurstGenLambda'] = data[2]
-            params['Bitrate'] = data[3]
-            params['ParetoMinSize'] = data[4]
-            params['ParetoMaxSize'] = data[5]
-            params['ParetoAlfa'] = data[6]
-            params['ExpMaxFactor'] = data[7]
-            dict_traffic['TimeDistParams'] = params
-            return 8
-        else: return -1
+        dist = int(data[0])
+        if (dist != data[0] or dist < 0 or dist >= len(self._TIME_DIST_PARAMS)):
+            return -1
+        (time_dist, param_names) = self._TIME_DIST_PARAMS[dist]
+        if (len(data) <= len(param_names)):
+            raise IndexError("Missing %s parameters" % (time_dist.name))
+        dict_traffic['TimeDist'] = time_dist
+        dict_traffic['TimeDistParams'] = dict(zip(param_names, data[1:len(param_names)+1]))
+        return len(param_names)+1
     
     def _sizedistparams(self, data, starting_point, dict_traffic):
         """
@@ -1146,38 +2222,36 @@ class DatanetAPI:
 
         """
         
-        if data[starting_point] == 0:
-            dict_traffic['SizeDist'] = SizeDist.DETERMINISTIC_S
-            params = {}
-            params['AvgPktSize'] = data[starting_point+1]
-            dict_traffic['SizeDistParams'] = params
-        elif data[starting_point] == 1:
-            dict_traffic['SizeDist'] = SizeDist.UNIFORM_S
-            params = {}
-            params['AvgPktSize'] = data[starting_point+1]
-            params['MinSize'] = data[starting_point+2]
-            params['MaxSize'] = data[starting_point+3]
-            dict_traffic['SizeDistParams'] = params
-        elif data[starting_point] == 2:
-            dict_traffic['SizeDist'] = SizeDist.BINOMIAL_S
-            params = {}
-            params['AvgPktSize'] = data[starting_point+1]
-            params['PktSize1'] = data[starting_point+2]
-            params['PktSize2'] = data[starting_point+3]
-            dict_traffic['SizeDistParams'] = params
-        elif data[starting_point] == 3:
-            dict_traffic['SizeDist'] = SizeDist.GENERIC_S
-            params = {}
-            params['AvgPktSize'] = data[starting_point+1]
-            params['NumCandidates'] = data[starting_point+2]
-            for i in range(0, int(data[starting_point+2]) * 2, 2):
-                params["Size_%d"%(i/2)] = data[starting_point+3+i]
-                params["Prob_%d"%(i/2)] = data[starting_point+4+i]
-            dict_traffic['SizeDistParams'] = params
-        else:
+        dist = int(data[starting_point])
+        if (dist != data[starting_point] or dist < 0 or dist >= len(self._SIZE_DIST_PARAMS)):
             return -1
+        (size_dist, param_names) = self._SIZE_DIST_PARAMS[dist]
+        if (len(data) <= starting_point+len(param_names)):
+            raise IndexError("Missing %s parameters" % (size_dist.name))
+        dict_traffic['SizeDist'] = size_dist
+        params = dict(zip(param_names, data[starting_point+1:starting_point+len(param_names)+1]))
+        if (size_dist == SizeDist.GENERIC_S):
+            num_candidates = max(int(data[starting_point+2]), 0)
+            # Checked before building the names, as NumCandidates may be bogus
+            if (len(data) < starting_point+3+2*num_candidates):
+                raise IndexError("Missing GENERIC_S size parameters")
+            generic_names = self._get_generic_size_params(num_candidates)
+            params.update(zip(generic_names, data[starting_point+3:starting_point+3+len(generic_names)]))
+        dict_traffic['SizeDistParams'] = params
         return 0
 
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _get_generic_size_params(num_candidates):
+        """
+        Returns the names of the Size_i and Prob_i parameters of a GENERIC_S
+        size distribution, in the order they appear in the traffic files.
+        The names of the most used numbers of candidates are kept.
+        """
+        
+        return tuple(name for i in range(num_candidates)
+                     for name in ("Size_%d" % i, "Prob_%d" % i))
+
     def _process_link_usage_line(self, lline,s):
         """
 
@@ -1199,25 +2273,39 @@ class DatanetAPI:
         l = lline.split(";")
         netSize = s.get_network_size()
         
+        links = []
         for i in range(netSize):
             links_stat.append({})
-            for j in range(netSize):
-                params = l[i*netSize+j].split(",")
-                if (params[0] == "-1"):
+            # The cells of node i are sliced once and only the cells of
+            # existing links are kept
+            for j, cell in enumerate(l[i*netSize:(i+1)*netSize]):
+                if (cell == "-1" or cell.startswith("-1,")):
                     continue
-                link_stat = {}
-                link_stat["utilization"] = float(params[0])
-                link_stat["loses"] = float(params[1])
-                num_qos_queues = int((len(params)-2)/3)
-                qos_queue_stat_lst = []
-                for q in range(num_qos_queues):
-                    qos_queue_stat = {"loses":float(params[2+q*3]),
-                                      "avgQueueOcupation":float(params[2+q*5+1]),
-                                      "maxQueueOcupation":int(params[2+q*5+2]),
-                                      "lastPktsQueueOcupation":int(params[2+q*5+3]),
-                                      "lastBitsQueueOcupation":int(params[2+q*5+4])}
-                    qos_queue_stat_lst.append(qos_queue_stat)
-                link_stat["qos_queues_stat"] = qos_queue_stat_lst;
-                links_stat[i][j] = link_stat
+                links.append((i, j, cell))
+        
+        # All the links usually have the same number of parameters, and then
+        # their values are parsed at once. Otherwise each link is split.
+        cells = [cell for (i, j, cell) in links]
+        num_params = cells[0].count(",") + 1 if cells else 0
+        if (cells and all(cell.count(",") + 1 == num_params and not cell.endswith(",") for cell in cells)):
+            links_params = numpy.fromstring(",".join(cells), sep=",").reshape(len(cells), num_params).tolist()
+        else:
+            links_params = [cell.split(",") for cell in cells]
+        
+        for (i, j, cell), params in zip(links, links_params):
+            link_stat = {}
+            link_stat["utilization"] = float(params[0])
+            link_stat["loses"] = float(params[1])
+            num_qos_queues = int((len(params)-2)/3)
+            qos_queue_stat_lst = []
+            for q in range(num_qos_queues):
+                qos_queue_stat = {"loses":float(params[2+q*3]),
+                                  "avgQueueOcupation":float(params[2+q*5+1]),
+                                  "maxQueueOcupation":int(params[2+q*5+2]),
+                                  "lastPktsQueueOcupation":int(params[2+q*5+3]),
+                                  "lastBitsQueueOcupation":int(params[2+q*5+4])}
+                qos_queue_stat_lst.append(qos_queue_stat)
+            link_stat["qos_queues_stat"] = qos_queue_stat_lst;
+            links_stat[i][j] = link_stat
 #         
         s.links_performance = links_stat